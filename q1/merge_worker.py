@@ -1,6 +1,12 @@
+import bisect
 import json
+import os
 from pathlib import Path
 from dataclasses import dataclass
+from typing import Optional, Union
+
+# Shared encoder: json.dumps with non-default separators builds a new encoder per call
+_ENC = json.JSONEncoder(separators=(",", ":"))
 
 @dataclass
 class Message:
@@ -14,6 +20,25 @@ class WorkerStats:
     messages_received: int # Number of messages read
     values_output: int    # Number of values written to output
 
+@dataclass(slots=True)
+class WorkerState:
+    phase: str                      # "INIT", "MERGE" or "DONE"
+    my_min: Optional[int]
+    my_max: Optional[int]
+    my_count: int
+    partner_min: Optional[int]
+    partner_max: Optional[int]
+    partner_count: Optional[int]
+    data_index: int                 # Next unmerged position in data
+    output_count: int
+    rang_sent: bool
+    last_sent: Union[int, str, None]  # Last HEAD value sent, or "END"
+    byte_pos: int                   # Inbox offset already consumed
+    finish: bool
+    b_current: Optional[int]        # Partner's current head
+    b_end: bool                     # Partner has no values left
+    take_wait: bool                 # TAKE sent, waiting for partner's reply
+
 class MergeWorker:
     def __init__(self,
                  worker_id: str,        # "A" or "B"
@@ -30,59 +55,77 @@ class MergeWorker:
         self.state_file = state_file
         self.stats = WorkerStats(0, 0, 0, 0)
 
-        self.state: dict = self._load_state()
+        # Records accumulate in memory and go out as one O_APPEND write per file per step
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        self._outbox_fd = os.open(self.outbox, flags, 0o644)
+        self._output_fd = os.open(self.output, flags, 0o644)
+        self._outbox_buf = bytearray()
+        self._output_buf = bytearray()
+
+        self.state: WorkerState = self._load_state()
 
-    def _load_state(self) -> dict:
+    def _load_state(self) -> WorkerState:
         """Load state from file, or initialize if first run."""
         if self.state_file.exists():
             with open(self.state_file) as f:
-                return json.load(f)
+                # Keyword construction: a file with other field names fails instead of misloading
+                return WorkerState(**json.load(f))
         return self._initial_state()
 
     def _save_state(self) -> None:
         """Persist state to file."""
-        with open(self.state_file, 'w') as f:
-            json.dump(self.state, f)
+        # Write-then-rename so a crash never leaves a torn state file
+        tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+        with open(tmp, 'w') as f:
+            # Flat fields: ints, strings, bools and None round-trip through JSON unchanged
+            fields = {name: getattr(self.state, name) for name in WorkerState.__slots__}
+            f.write(_ENC.encode(fields))
+        os.replace(tmp, self.state_file)
             
-    def _initial_state(self) -> dict:
+    def _initial_state(self) -> WorkerState:
         """Return initial state structure."""
-        # Implement this - define your state variables
-        return {
-            "phase": "INIT",
-            "my_min": min(self.data) if self.data else None,
-            "my_max": max(self.data) if self.data else None,
-            "my_count": len(self.data),
-            "partner_min": None,
-            "partner_max": None,
-            "partner_count": None,
-            "data_index": 0,
-            "output_count": 0,
-            # Add more state variables as needed
-            "rang_sent": False,
-            "last_sent": None,
-            "file_pos": 0,
-            "finish": False,
-            "b_current": None,
-            "b_end": False,
-            "take_wait": False,
-        }
+        return WorkerState(
+            phase="INIT",
+            my_min=min(self.data) if self.data else None,
+            my_max=max(self.data) if self.data else None,
+            my_count=len(self.data),
+            partner_min=None,
+            partner_max=None,
+            partner_count=None,
+            data_index=0,
+            output_count=0,
+            rang_sent=False,
+            last_sent=None,
+            byte_pos=0,
+            finish=False,
+            b_current=None,
+            b_end=False,
+            take_wait=False,
+        )
 
     def _read_new_msgs(self) -> list[dict]:
         
-        if not self.inbox.exists():
+        # One stat() answers the common idle poll without opening the file
+        try:
+            size = os.stat(self.inbox).st_size
+        except FileNotFoundError:
+            return []
+        if size <= self.state.byte_pos:
             return []
-
-        file = self.inbox.read_text().splitlines()
-        start_pos = self.state["file_pos"]
-        new_msgs = file[start_pos:]
-        self.state["file_pos"] = len(file)
 
         msgs: list[dict] = []
-        for msg in new_msgs:
-            if not msg.strip():
-                continue
-            msgs.append(json.loads(msg))
-            self.stats.messages_received += 1
+        with open(self.inbox, "rb") as f:
+            f.seek(self.state.byte_pos)
+            for msg in f:
+                # Only consume complete lines; a partial last line is picked up next step
+                if not msg.endswith(b"\n"):
+                    break
+                self.state.byte_pos += len(msg)
+                if not msg.strip():
+                    continue
+                # str input skips json.loads' byte-encoding detection
+                msgs.append(json.loads(msg.decode()))
+                self.stats.messages_received += 1
         return msgs
     
     def _send_msgs(self, msg_type: str, values: list[int]) -> None:
@@ -94,20 +137,58 @@ class MergeWorker:
 
         msg = {"msg_type": msg_type, "values": values}
         
-        with open(self.outbox, "a") as f:
-            f.write(json.dumps(msg) + "\n")
+        self._outbox_buf += _ENC.encode(msg).encode()
+        self._outbox_buf += b"\n"
         self.stats.messages_sent += 1
 
     def _output_msg(self, v: int) -> None:
         
-        with open(self.output, "a") as f:
-            f.write(str(v) + "\n")
+        self._output_buf += b"%d\n" % v
         self.stats.values_output += 1
 
+    def _output_many(self, values: list[int]) -> None:
+        
+        self._output_buf += b"".join(b"%d\n" % v for v in values)
+        self.stats.values_output += len(values)
+
+    @staticmethod
+    def _write_all(fd: int, buf: bytearray) -> None:
+        if not buf:
+            return
+        n = os.write(fd, buf)
+        while n < len(buf):
+            n += os.write(fd, buf[n:])
+        buf.clear()
+
+    def _flush(self) -> None:
+        """Push buffered output values and messages to their files."""
+        # Output first: a message sent this step may let the partner emit values after ours
+        self._write_all(self._output_fd, self._output_buf)
+        self._write_all(self._outbox_fd, self._outbox_buf)
+
+    def close(self) -> None:
+        """Flush and close the outbox and output descriptors."""
+        if self._outbox_fd < 0:
+            return
+        self._flush()
+        os.close(self._outbox_fd)
+        os.close(self._output_fd)
+        self._outbox_fd = self._output_fd = -1
+
+    def __del__(self) -> None:
+        if getattr(self, "_output_fd", -1) >= 0:
+            self.close()
+
     def step(self) -> bool:
+        """Run one protocol step and persist state once at the end."""
+        result = self._advance()
+        self._flush()
+        self._save_state()
+        return result
+
+    def _advance(self) -> bool:
         
-        if self.state["finish"]:
-            self._save_state()
+        if self.state.finish:
             return False
 
         inbox_msgs = self._read_new_msgs()
@@ -118,67 +199,80 @@ class MergeWorker:
 
             if msg_t == "RANG":
                 if len(msg_vals) == 3:
-                    self.state["partner_min"] = msg_vals[0]
-                    self.state["partner_max"] = msg_vals[1]
-                    self.state["partner_count"] = msg_vals[2]
+                    self.state.partner_min = msg_vals[0]
+                    self.state.partner_max = msg_vals[1]
+                    self.state.partner_count = msg_vals[2]
             elif msg_t == "HEAD":
                 if len(msg_vals) == 1:
-                    self.state["b_current"] = msg_vals[0]
-                    self.state["b_end"] = False
-                    self.state["take_wait"] = False
+                    self.state.b_current = msg_vals[0]
+                    self.state.b_end = False
+                    self.state.take_wait = False
             elif msg_t == "END":
-                self.state["b_current"] = None
-                self.state["b_end"] = True
-                self.state["take_wait"] = False
+                self.state.b_current = None
+                self.state.b_end = True
+                self.state.take_wait = False
             elif msg_t == "TAKE":
-                idx = self.state["data_index"]
+                idx = self.state.data_index
+
+                # TAKE names the head it was decided against; if that head is already
+                # out, the HEAD for our new head answers it instead
+                if msg_vals and idx < len(self.data) and self.data[idx] != msg_vals[0]:
+                    continue
                 
                 if idx < len(self.data):
                     val = self.data[idx]
                     self._output_msg(val)
-                    self.state["data_index"] += 1
+                    self.state.data_index += 1
 
-                    if self.state["data_index"] < len(self.data):
-                        new_head = self.data[self.state["data_index"]]
+                    if self.state.data_index < len(self.data):
+                        new_head = self.data[self.state.data_index]
                         self._send_msgs("HEAD", [new_head])
-                        self.state["last_sent"] = new_head
-                        self.state["b_end"] = False
+                        self.state.last_sent = new_head
+                        self.state.b_end = False
                     else:
                         self._send_msgs("END", [])
-                        self.state["last_sent"] = "END"
+                        self.state.last_sent = "END"
                 else:
                     self._send_msgs("END", [])
-                    self.state["last_sent"] = "END"
+                    self.state.last_sent = "END"
 
-        phase = self.state["phase"]
+        phase = self.state.phase
 
         # INIT
         if phase == "INIT":
             
-            if not self.state["rang_sent"]:
+            if not self.state.rang_sent:
                 
-                my_min = self.state["my_min"]
+                my_min = self.state.my_min
                 if my_min is None:
                     my_min = -1
 
-                my_max = self.state["my_max"]
+                my_max = self.state.my_max
                 if my_max is None:
                     my_max = -1
 
-                self._send_msgs("RANG", [my_min, my_max, self.state["my_count"]])
-                self.state["rang_sent"] = True
-                self._save_state()
+                self._send_msgs("RANG", [my_min, my_max, self.state.my_count])
+                self.state.rang_sent = True
                 return True
 
-            if self.state["partner_count"] is not None:
-                self.state["phase"] = "MERGE"
-            self._save_state()
+            if self.state.partner_count is not None:
+                self.state.phase = "MERGE"
+
+                # Values below the partner's minimum precede all of its data, so emit
+                # them now without any HEAD/TAKE round trips
+                if self.state.partner_count == 0:
+                    lo = len(self.data)
+                else:
+                    lo = bisect.bisect_left(self.data, self.state.partner_min)
+                if lo > 0:
+                    self._output_many(self.data[:lo])
+                    self.state.data_index = lo
             return True
 
         # MERGE
         if phase == "MERGE":
             
-            data_index = self.state["data_index"]
+            data_index = self.state.data_index
             
             if data_index >= len(self.data):
                 done_stage = True
@@ -187,63 +281,54 @@ class MergeWorker:
 
             if done_stage:
                 
-                if self.state.get("last_sent") != "END":
+                if self.state.last_sent != "END":
                     self._send_msgs("END", [])
-                    self.state["last_sent"] = "END"
-                    self._save_state()
+                    self.state.last_sent = "END"
                     return True
 
-                if self.state.get("b_end", False):
-                    self.state["phase"] = "DONE"
-                self._save_state()
+                if self.state.b_end:
+                    self.state.phase = "DONE"
+                return True
+
+            if self.state.b_end:
+                # Partner has emitted everything; the rest of our data follows in one write
+                self._output_many(self.data[data_index:])
+                self.state.data_index = len(self.data)
                 return True
 
             curr_head = self.data[data_index]
 
-            if self.state.get("last_sent") != curr_head:
+            if self.state.last_sent != curr_head:
                 self._send_msgs("HEAD", [curr_head])
-                self.state["last_sent"] = curr_head
-                self._save_state()
-                return True
-
-            if self.state["b_end"]:
-                self._output_msg(curr_head)
-                self.state["data_index"] += 1
-                self._save_state()
+                self.state.last_sent = curr_head
                 return True
 
-            b_current = self.state.get("b_current")
+            b_current = self.state.b_current
             if b_current is not None:
                 
                 self.stats.comparisons += 1
 
                 if curr_head < b_current:
                     self._output_msg(curr_head)
-                    self.state["data_index"] += 1
+                    self.state.data_index += 1
                 else:
-                    if not self.state.get("take_wait", False):
-                        self._send_msgs("TAKE", [])
-                        self.state["take_wait"] = True
-                    self._save_state()
+                    if not self.state.take_wait:
+                        self._send_msgs("TAKE", [b_current])
+                        self.state.take_wait = True
                     return True
                 
-                self._save_state()
                 return True
 
-            self._save_state()
             return True
 
         # DONE
         if phase == "DONE":
-            if self.state["b_end"] and self.state["data_index"] >= len(self.data):
-                self.state["finish"] = True
-                self._save_state()
+            if self.state.b_end and self.state.data_index >= len(self.data):
+                self.state.finish = True
                 return False
 
-            self._save_state()
             return True
 
-        self._save_state()
         return True
 
     def get_stats(self) -> WorkerStats:
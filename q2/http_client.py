@@ -2,9 +2,12 @@ import json
 import random
 import time
 import datetime as dt
-from typing import Optional, Dict, Any
-import urllib.request
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+import http.client
 import urllib.error
+import urllib.parse
 import socket
 from url_provider import URLProvider, ResponseValidator
 
@@ -16,26 +19,62 @@ class ResponseHandler:
     def __init__(self, log_path: str = "output.log", validator: Optional[Any] = None):
         self.log_path = log_path
         self.validator = validator
-
-        with open(self.log_path, "w", encoding="utf-8") as f:
-            f.write("")
+        # (epoch ms, formatted timestamp); reused for events in the same millisecond
+        self._ts_ms_cache = (-1, "")
+
+        # One buffered handle for the handler's lifetime; the lock serializes fetch threads.
+        # The handler alone flushes it, on the events that settle a URL (success, client
+        # error, max retries); slow_response/body_match lines go out with the next flush or close
+        self._fp = open(self.log_path, "w", encoding="utf-8", buffering=1 << 16)
+        self._fp_lock = threading.Lock()
+
+    def flush(self) -> None:
+        """Push buffered log lines to the log file."""
+        with self._fp_lock:
+            self._fp.flush()
+
+    def close(self) -> None:
+        """Flush and close the log file."""
+        with self._fp_lock:
+            if not self._fp.closed:
+                self._fp.close()
+
+    def __del__(self) -> None:
+        if getattr(self, "_fp", None) is not None:
+            self.close()
 
     def _record_callback(self, url: str, callback_name: str) -> None:
         if self.validator is not None:
             self.validator.add_callback(url, callback_name)
 
+    def _timestamp(self) -> str:
+        ms = time.time_ns() // 1_000_000
+        cached_ms, stamp = self._ts_ms_cache
+        if ms != cached_ms:
+            # Formatted from the same ms as the cache key, so key and stamp always agree
+            seconds, millis = divmod(ms, 1000)
+            when = dt.datetime.fromtimestamp(seconds, dt.timezone.utc).replace(microsecond=millis * 1000)
+            stamp = when.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+            self._ts_ms_cache = (ms, stamp)
+        return stamp
+
     def _log_file_info(self, event: str, **infos: Any) -> None:
-        line = {"timestamp": utc_iso8601(), "event": event, **infos}
-        with open(self.log_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(line) + "\n")
+        line = {"timestamp": self._timestamp(), "event": event, **infos}
+        encoded = json.dumps(line)
+        # Two writes into the buffer instead of building a concatenated copy of the line
+        with self._fp_lock:
+            self._fp.write(encoded)
+            self._fp.write("\n")
 
     def on_success(self, url: str, status: int, body: bytes, latency_ms: float) -> None:
         self._record_callback(url, "on_success")
         self._log_file_info("success", url=url, status=status, latency_ms=latency_ms)
+        self.flush()
 
     def on_client_error(self, url: str, status: int, body: bytes) -> None:
         self._record_callback(url, "on_client_error")
         self._log_file_info("client_error", url=url, status=status)
+        self.flush()
 
     def on_server_error(self, url: str, status: int, attempt: int) -> None:
         self._record_callback(url, "on_server_error")
@@ -64,6 +103,7 @@ class ResponseHandler:
     def on_max_retries(self, url: str, attempts: int, last_error: str) -> None:
         self._record_callback(url, "on_max_retries")
         self._log_file_info("max_retries", url=url, attempts=attempts, last_error=last_error)
+        self.flush()
 
 class RobustHTTPClient:
     # Example values; adjust as needed
@@ -75,9 +115,119 @@ class RobustHTTPClient:
     BACKOFF_MULTIPLIER = 2.0
     # Arbitrary; adjust to match test data
     MONITORED_KEYWORDS = ["foo", "bar", "baz"]
+    MAX_REDIRECTS = 10
+    MAX_WORKERS = 32
+    MAX_IDLE_PER_HOST = 8
 
     def __init__(self, handler: ResponseHandler):
         self.handler = handler
+        # Idle keep-alive connections keyed by (scheme, host, port), shared by fetch threads
+        self._idle: Dict[Tuple[str, str, Optional[int]], List[http.client.HTTPConnection]] = {}
+        self._idle_lock = threading.Lock()
+        # Keywords encoded once so bodies are searched as raw bytes, never decoded
+        self._kw_bytes = [(k, k.encode()) for k in self.MONITORED_KEYWORDS]
+        # Base delay per attempt; capping here doesn't change the result since jitter is non-negative
+        self._base_delays = [
+            min(self.INITIAL_BACKOFF_MS * (self.BACKOFF_MULTIPLIER ** i), self.MAX_BACKOFF_MS)
+            for i in range(self.MAX_RETRIES + 1)
+        ]
+
+    def _checkout(self, key: Tuple[str, str, Optional[int]]) -> http.client.HTTPConnection:
+        with self._idle_lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.BASE_TIMEOUT_SEC)
+        return http.client.HTTPConnection(host, port, timeout=self.BASE_TIMEOUT_SEC)
+
+    def _checkin(self, key: Tuple[str, str, Optional[int]], conn: http.client.HTTPConnection) -> None:
+        # Only a connection with a live socket is worth keeping; the server may have closed it
+        if conn.sock is None:
+            return
+        with self._idle_lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.MAX_IDLE_PER_HOST:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(self, conn: http.client.HTTPConnection, path: str) -> Tuple[http.client.HTTPResponse, bytes]:
+        try:
+            conn.request("GET", path)
+        except OSError as exp:
+            conn.close()
+            raise urllib.error.URLError(exp)
+        except Exception:
+            # e.g. InvalidURL from putrequest; closing resets the half-started request
+            conn.close()
+            raise
+        try:
+            resp = conn.getresponse()
+            return resp, resp.read()
+        except Exception:
+            conn.close()
+            raise
+
+    def _get(self, url: str) -> Tuple[int, bytes]:
+        """
+        GET url over a pooled keep-alive connection.
+
+        Mirrors urlopen: follows redirects, raises HTTPError for non-2xx
+        responses and URLError when the request cannot be sent.
+        Unlike urlopen it ignores proxy environment variables, only handles
+        http/https URLs, and drops user:pass@ credentials instead of sending them.
+        """
+        for _ in range(self.MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            # Checked on every hop, so redirects can't leave http/https either
+            if parts.scheme not in ("http", "https"):
+                raise urllib.error.URLError(f"unknown url type: {parts.scheme}")
+            try:
+                key = (parts.scheme, parts.hostname, parts.port)
+            except ValueError as exp:
+                raise urllib.error.URLError(exp)
+            if not parts.hostname:
+                raise urllib.error.URLError("no host given")
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+
+            conn = self._checkout(key)
+            reused = conn.sock is not None
+            try:
+                resp, body = self._send(conn, path)
+            except (urllib.error.URLError, http.client.RemoteDisconnected, ConnectionResetError):
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive socket; retry once on a fresh one
+                resp, body = self._send(conn, path)
+            # Back to the pool only once the response has been read to the end;
+            # _send closes the connection on any error and it is dropped here
+            self._checkin(key, conn)
+
+            location = resp.getheader("Location")
+            if resp.status in (301, 302, 303, 307, 308) and location:
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if not 200 <= resp.status < 300:
+                raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+            return resp.status, body
+
+        raise urllib.error.HTTPError(url, resp.status, "too many redirects", resp.headers, None)
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        with self._idle_lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def __del__(self) -> None:
+        if getattr(self, "_idle", None):
+            self.close()
         
     def calculate_backoff(self, attempt: int) -> float:
         """
@@ -94,7 +244,10 @@ class RobustHTTPClient:
             jitter = random.uniform(0, 0.1 * base_delay)
             delay = min(base_delay + jitter, MAX_BACKOFF_MS)
         """
-        base_delay = self.INITIAL_BACKOFF_MS * (self.BACKOFF_MULTIPLIER ** attempt)
+        if attempt < len(self._base_delays):
+            base_delay = self._base_delays[attempt]
+        else:
+            base_delay = min(self.INITIAL_BACKOFF_MS * (self.BACKOFF_MULTIPLIER ** attempt), self.MAX_BACKOFF_MS)
         jitter = random.uniform(0, 0.1 * base_delay)
         return min(base_delay + jitter, self.MAX_BACKOFF_MS)
 
@@ -119,28 +272,48 @@ class RobustHTTPClient:
         Before each retry, call on_retry.
         After max retries exhausted, call on_max_retries.
         """
+        return self._fetch_with_retries(url)
+
+    def _handle_retry(self, url: str, try_num: int, reason: str, retry_reason: Optional[str] = None) -> bool:
+        """
+        Report a failed attempt and back off before the next one.
+
+        Returns:
+            True if the caller should retry, False once retries are exhausted.
+        """
+        if try_num == self.MAX_RETRIES:
+            self.handler.on_max_retries(url, self.MAX_RETRIES, reason)
+            return False
+
+        wait_ms = self.calculate_backoff(try_num)
+        self.handler.on_retry(url, try_num, wait_ms, retry_reason or reason)
+        time.sleep(wait_ms / 1000.0)
+        return True
+
+    def _handle_success(self, url: str, status_code: int, body_info: bytes, latency_ms: float) -> None:
+        """Report a 2xx response: success, slow check, and keyword scan in one pass."""
+        handler = self.handler
+        handler.on_success(url, status_code, body_info, latency_ms)
+
+        if latency_ms > self.SLOW_THRESHOLD_MS:
+            handler.on_slow_response(url, latency_ms)
+
+        for keyword, kb in self._kw_bytes:
+            if kb and kb in body_info:
+                handler.on_body_match(url, keyword)
+
+    def _fetch_with_retries(self, url: str) -> bool:
         last_err_reason = ""
         for try_num in range(self.MAX_RETRIES + 1):
             start = time.perf_counter()
 
             try:
-                with urllib.request.urlopen(url, timeout=self.BASE_TIMEOUT_SEC) as resp:
-                    body_info = resp.read()
-                    status_code = resp.getcode()
+                status_code, body_info = self._get(url)
 
                 latency_ms =  1000.0 * (time.perf_counter() - start)
 
                 if 200 <= status_code < 300:
-                    self.handler.on_success(url, status_code, body_info, latency_ms)
-                    body_text = body_info.decode("utf-8", errors="ignore")
-
-                    if latency_ms > self.SLOW_THRESHOLD_MS:
-                        self.handler.on_slow_response(url, latency_ms)
-                    
-                    for keyword in self.MONITORED_KEYWORDS:
-                        if keyword in body_text and keyword != "":
-                            self.handler.on_body_match(url, keyword)
-
+                    self._handle_success(url, status_code, body_info, latency_ms)
                     return True
 
                 if 400 <= status_code < 500:
@@ -151,26 +324,11 @@ class RobustHTTPClient:
                 if 500 <= status_code < 600:
                     self.handler.on_server_error(url, status_code, try_num)
                     last_err_reason = f"server_error:{status_code}"
+                else:
+                    last_err_reason = f"unexpected_status:{status_code}"
 
-                    if try_num == self.MAX_RETRIES:
-                        self.handler.on_max_retries(url, self.MAX_RETRIES, last_err_reason)
-                        return False
-
-                    wait_ms = self.calculate_backoff(try_num)
-                    self.handler.on_retry(url, try_num, wait_ms, last_err_reason)
-                    time.sleep(wait_ms / 1000.0)
-                    continue
-
-                unexpected_err_reason = f"unexpected_status:{status_code}"
-                
-                if try_num == self.MAX_RETRIES:
-                    self.handler.on_max_retries(url, self.MAX_RETRIES, unexpected_err_reason)
+                if not self._handle_retry(url, try_num, last_err_reason):
                     return False
-                
-                wait_ms = self.calculate_backoff(try_num)
-                self.handler.on_retry(url, try_num, wait_ms, unexpected_err_reason)
-                time.sleep(wait_ms / 1000.0)
-                continue
             
             except urllib.error.HTTPError as exp:
                 if exp.code is not None:
@@ -187,67 +345,34 @@ class RobustHTTPClient:
                 if 500 <= status_code < 600:
                     self.handler.on_server_error(url, status_code, try_num)
                     last_err_reason = f"server_error:{status_code}"
+                else:
+                    last_err_reason = f"http_error:{status_code}"
 
-                    if try_num == self.MAX_RETRIES:
-                        self.handler.on_max_retries(url, self.MAX_RETRIES, last_err_reason)
-                        return False
-
-                    wait_ms = self.calculate_backoff(try_num)
-                    self.handler.on_retry(url, try_num, wait_ms, reason=last_err_reason)
-                    time.sleep(wait_ms / 1000.0)
-                    continue
-
-                unexpected_err_reason = f"http_error:{status_code}"
-                
-                if try_num == self.MAX_RETRIES:
-                    self.handler.on_max_retries(url, self.MAX_RETRIES, unexpected_err_reason)
+                if not self._handle_retry(url, try_num, last_err_reason):
                     return False
-                
-                wait_ms = self.calculate_backoff(try_num)
-                self.handler.on_retry(url, try_num, wait_ms, unexpected_err_reason)
-                time.sleep(wait_ms / 1000.0)
-                continue
             
             except (socket.timeout, TimeoutError):
                 self.handler.on_timeout(url, try_num, self.BASE_TIMEOUT_SEC)
-                last_err_reason = f"timeout"
+                last_err_reason = "timeout"
 
-                if try_num == self.MAX_RETRIES:
-                    self.handler.on_max_retries(url, self.MAX_RETRIES, last_err_reason)
+                if not self._handle_retry(url, try_num, last_err_reason):
                     return False
 
-                wait_ms = self.calculate_backoff(try_num)
-                self.handler.on_retry(url, try_num, wait_ms, last_err_reason)
-                time.sleep(wait_ms / 1000.0)
-                continue
-
             except urllib.error.URLError as exp:
                 err_info = str(exp)
                 self.handler.on_connection_error(url, try_num, err_info)
                 last_err_reason = f"connection_error:{err_info}"
 
-                if try_num == self.MAX_RETRIES:
-                    self.handler.on_max_retries(url, self.MAX_RETRIES, last_err_reason)
+                if not self._handle_retry(url, try_num, last_err_reason, "connection_error"):
                     return False
 
-                wait_ms = self.calculate_backoff(try_num)
-                self.handler.on_retry(url, try_num, wait_ms, "connection_error")
-                time.sleep(wait_ms / 1000.0)
-                continue
-
             except Exception as exp:
                 err_info = str(exp)
                 self.handler.on_connection_error(url, try_num, err_info)
                 last_err_reason = f"connection_error:{err_info}"
 
-                if try_num == self.MAX_RETRIES:
-                    self.handler.on_max_retries(url, self.MAX_RETRIES, last_err_reason)
+                if not self._handle_retry(url, try_num, last_err_reason, "exception"):
                     return False
-
-                wait_ms = self.calculate_backoff(try_num)
-                self.handler.on_retry(url, try_num, wait_ms, reason="exception")
-                time.sleep(wait_ms / 1000.0)
-                continue
         
         final_err_reason = last_err_reason or "unknown"
         self.handler.on_max_retries(url, self.MAX_RETRIES, final_err_reason)
@@ -275,13 +400,24 @@ class RobustHTTPClient:
         sum_latency_ms = 0.0
         success_latency_count = 0
 
+        urls: List[str] = []
         while True:
             url = provider.next_url()
             if url is None:
                 break
+            urls.append(url)
+
+        # Fetches are I/O bound, so overlap them (including retry backoff sleeps)
+        try:
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+                results = list(executor.map(self.fetch, urls))
+        finally:
+            # Don't hold idle sockets open once the batch is done
+            self.close()
+
+        for url, start_fetch in zip(urls, results):
             total_urls += 1
 
-            start_fetch = self.fetch(url)
             if start_fetch:
                 successful += 1
             else:
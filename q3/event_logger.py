@@ -1,10 +1,22 @@
 from __future__ import annotations
+import heapq
+import mmap
+import os
+from binascii import b2a_hex
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 from message_source import MessageSource, Packet
 
 
+# fdatasync skips the metadata flush; platforms without it (macOS) fall back to fsync
+_datasync = getattr(os, "fdatasync", os.fsync)
+
+# One line template per status with the status literal already in place
+_LINE_FMT = {status: b"%d,%.6f,%s," + status.encode() + b"\n"
+             for status in ("OK", "LATE", "RETRANSMIT")}
+
+
 @dataclass
 class LoggerStats:
     packets_received: int = 0       # Total packets from source
@@ -37,17 +49,21 @@ class EventLogger:
         self.buffer_size = buffer_size
         
         # Your state variables
-        self.buffer: list[Packet] = []
-        self.seen_sequences: set[int] = set()
+        self.buffer: list[tuple[int, Packet]] = []  # min-heap keyed on sequence
+        self.buffer_by_seq: dict[int, Packet] = {}  # live buffered packets; heap entries not here are stale
+        self.seen_sequences: set[int] = set()  # received ids at or above _seen_base
         self.last_written_seq: int = -1
         self.pending_retransmits: set[int] = set()
         # Add more as needed
 
         self.expected_sequence: int = 0
         self.retransmitted_seqs: set[int] = set()
+        self._seen_base: int = 0  # ids in [0, _seen_base) were all received; pruned from seen_sequences
         self.gap_wait_cycles: int = 0
         self.gap_wait_limit: int = max(6, buffer_size // 2)
         self.gap_skip_limit: int = max(1, buffer_size // 10)
+        self._buffer_dirty: bool = False  # buffer changed since a flush that made no progress
+        self._line_buf: list[bytes] = []  # log lines for the current flush, reused across flushes
 
         self.stats = LoggerStats()
 
@@ -56,6 +72,8 @@ class EventLogger:
             self.log_file.touch()
 
         self._load_existing_log()
+        # One buffered append handle for the logger's lifetime; synced and closed in _finalize
+        self._fp = open(self.log_file, "ab", buffering=1 << 16)
 
     def run(self) -> LoggerStats:
         """
@@ -71,26 +89,42 @@ class EventLogger:
         Returns:
             Statistics about logging performance.
         """
+        # Per-packet counter lives in a local and is stored back once the loop exits
+        received = self.stats.packets_received
+        # Bound methods resolved once instead of on every iteration
+        receive = self.source.receive
+        handle_packet = self._handle_packet
+        should_flush = self._should_flush
+        flush_buffer = self._flush_buffer
         try:
             while True:
-                packet = self.source.receive()
+                packet = receive()
                 if packet is None:
-                    self._finalize()
-                    return self.stats
+                    break
 
-                self.stats.packets_received += 1
-                self._handle_packet(packet)
+                received += 1
+                handle_packet(packet)
 
-                if self._should_flush():
-                    self._flush_buffer()
+                if should_flush():
+                    flush_buffer()
 
         except SystemExit:
-            self._finalize()
-            return self.stats
+            pass
+        finally:
+            self.stats.packets_received = received
+
+        self._finalize()
+        return self.stats
 
     def _handle_packet(self, packet: Packet) -> None:
         """Process a single packet."""
         seq_id = packet.sequence
+        seen = self.seen_sequences
+
+        # Cheap duplicate test first so repeated packets never pay for checksum verification
+        if 0 <= seq_id < self._seen_base or seq_id in seen:
+            self.stats.duplicates_discarded += 1
+            return
 
         if self.source.verify_checksum(packet):
             pass
@@ -106,23 +140,21 @@ class EventLogger:
                 
             return
 
-        if seq_id in self.seen_sequences:
-            self.stats.duplicates_discarded += 1
-            return
-
-        self.seen_sequences.add(seq_id)
+        seen.add(seq_id)
 
         if seq_id in self.retransmitted_seqs:
             self.stats.retransmits_received += 1
 
-        self.buffer.append(packet)
+        heapq.heappush(self.buffer, (seq_id, packet))
+        self.buffer_by_seq[seq_id] = packet
+        self._buffer_dirty = True
 
     def _should_flush(self) -> bool:
         """Determine if buffer should be flushed."""
-        if len(self.buffer) >= self.buffer_size:
+        if len(self.buffer_by_seq) >= self.buffer_size:
             return True
 
-        has_expected = any(seq_id.sequence == self.expected_seq for seq_id in self.buffer)
+        has_expected = self.expected_sequence in self.buffer_by_seq
 
         if has_expected:
             self.gap_wait_cycles = 0
@@ -135,18 +167,19 @@ class EventLogger:
 
     def _flush_buffer(self) -> None:
         """Write buffered packets to log."""
-        if not self.buffer:
+        if not self.buffer_by_seq:
             return
 
         self.stats.buffer_flushes += 1
-        self.buffer.sort(key=lambda seq_id: seq_id.sequence)
+        if not self._buffer_dirty:
+            # The last pass changed nothing and no packet arrived since; this one would repeat it
+            return
+
+        out = self._line_buf
+        requested = False
 
         while True:
-            packet = None
-            for i, p in enumerate(self.buffer):
-                if p.sequence == self.expected_sequence:
-                    packet = self.buffer.pop(i)
-                    break
+            packet = self.buffer_by_seq.pop(self.expected_sequence, None)
 
             if packet is None:
                 break
@@ -155,12 +188,10 @@ class EventLogger:
                 status = "RETRANSMIT"
             else:
                 status = "OK"
-            self._write_packet(packet, status=status)
+            out.append(self._format_packet(packet, status))
             self.expected_sequence += 1
 
-        self.buffer.sort(key=lambda seq_id: seq_id.sequence)
-
-        if not any(seq_id.sequence == self.expected_sequence for seq_id in self.buffer):
+        if self.expected_sequence not in self.buffer_by_seq:
             exp_seq_id = self.expected_sequence
 
             if exp_seq_id not in self.pending_retransmits:
@@ -168,23 +199,18 @@ class EventLogger:
                 self.pending_retransmits.add(exp_seq_id)
                 self.retransmitted_seqs.add(exp_seq_id)
                 self.stats.retransmit_requests += 1
+                requested = True
 
         skip_count = 0
-        while skip_count < self.gap_skip_limit and (self.buffer != []):
-            self.buffer.sort(key=lambda seq_id: seq_id.sequence)
-            smallest_seq_id = self.buffer[0].sequence
+        while skip_count < self.gap_skip_limit and self.buffer_by_seq:
+            smallest_seq_id = self._smallest_seq()
 
             if smallest_seq_id > self.expected_sequence:
-                self.stats.gaps += 1
                 self.expected_sequence += 1
                 skip_count += 1
 
                 while True:
-                    packet = None
-                    for i, p in enumerate(self.buffer):
-                        if p.sequence == self.expected_sequence:
-                            packet = self.buffer.pop(i)
-                            break
+                    packet = self.buffer_by_seq.pop(self.expected_sequence, None)
 
                     if packet is None:
                         break
@@ -194,38 +220,101 @@ class EventLogger:
                     else:
                         status = "OK"
                     
-                    self._write_packet(packet, status=status)
+                    out.append(self._format_packet(packet, status))
                     self.expected_sequence += 1
             else:
                 break
+        self.stats.gaps += skip_count
 
-        while len(self.buffer) > self.buffer_size:
-            self.buffer.sort(key=lambda seq_id: seq_id.sequence)
-            packet = self.buffer.pop(0)
+        while len(self.buffer_by_seq) > self.buffer_size:
+            packet = self._pop_smallest()
             if packet.sequence in self.retransmitted_seqs:
                 status = "RETRANSMIT"
             else:
                 status = "LATE"
-            self._write_packet(packet, status=status)
+            out.append(self._format_packet(packet, status))
+
+        # One write for everything this flush released
+        written = self._write_lines()
+        self._buffer_dirty = written > 0 or skip_count > 0 or requested
+
+        self._prune_seen()
+
+        # Rebuild the heap once stale entries outnumber live ones
+        if len(self.buffer) > 2 * len(self.buffer_by_seq):
+            self.buffer = [entry for entry in self.buffer if entry[0] in self.buffer_by_seq]
+            heapq.heapify(self.buffer)
+
+    def _write_lines(self) -> int:
+        """Write the collected lines in one call and reset the shared list; returns the count."""
+        out = self._line_buf
+        count = len(out)
+        self._fp.write(b"".join(out))
+        if count > 1024:
+            self._line_buf = []  # don't keep an oversized list around after a burst
+        else:
+            out.clear()
+        self.stats.packets_written += count
+        return count
+
+    def _prune_seen(self) -> None:
+        """Fold the contiguous run of received ids into _seen_base so the set only spans gaps."""
+        seen = self.seen_sequences
+        base = self._seen_base
+        while base in seen:
+            seen.discard(base)
+            base += 1
+        self._seen_base = base
+
+    def _smallest_seq(self) -> int:
+        """Lowest buffered sequence; drops stale heap entries on the way."""
+        while self.buffer[0][0] not in self.buffer_by_seq:
+            heapq.heappop(self.buffer)
+        return self.buffer[0][0]
+
+    def _pop_smallest(self) -> Packet:
+        """Remove and return the lowest-sequence buffered packet."""
+        while True:
+            seq_id, packet = heapq.heappop(self.buffer)
+            if self.buffer_by_seq.pop(seq_id, None) is not None:
+                return packet
 
     def _finalize(self) -> None:
         """Called after termination. Flush remaining buffer."""
         self._flush_buffer()
-        self.buffer.sort(key=lambda seq_id: seq_id.sequence)
-        while self.buffer != []:
-            packet = self.buffer.pop(0)
+        # Everything left goes out in sequence order; one sort beats a heappop per packet
+        remaining = sorted(self.buffer_by_seq.items())
+        self.buffer_by_seq.clear()
+        self.buffer.clear()
+        out = self._line_buf
+        for _, packet in remaining:
             if packet.sequence in self.retransmitted_seqs:
                 status = "RETRANSMIT"
             else:
                 status = "LATE"
-            self._write_packet(packet, status=status)
+            out.append(self._format_packet(packet, status))
+        self._write_lines()
 
         self.stats.final_buffer_size = 0
-
-    def _write_packet(self, packet: Packet, status: str) -> None:
+        self._fp.flush()
+        # One sync at termination makes the log durable without a per-write cost
+        _datasync(self._fp.fileno())
+        self.close()
+
+    def close(self) -> None:
+        """Flush and close the log file."""
+        if not self._fp.closed:
+            self._fp.close()
+
+    def __del__(self) -> None:
+        if getattr(self, "_fp", None) is not None:
+            self.close()
+
+    def _format_packet(self, packet: Packet, status: str) -> bytes:
+        """Build the log line for packet and count any inversion; callers count the write."""
         seq_id = packet.sequence
         time_log = packet.timestamp
-        pl_hex = packet.payload.hex()
+        pl_hex = b2a_hex(packet.payload)  # already bytes, no decode/encode round trip
 
         if self.last_written_seq != -1 and seq_id != self.last_written_seq + 1:
             out_of_order = True
@@ -240,35 +329,49 @@ class EventLogger:
         elif status == "RETRANSMIT" and out_of_order:
             self.stats.inversions += 1
 
-        line = f"{seq_id},{time_log:.6f},{pl_hex},{status}\n"
-        with self.log_file.open("a", encoding="utf-8") as f:
-            f.write(line)
+        line = _LINE_FMT[status] % (seq_id, time_log, pl_hex)
 
-        self.stats.packets_written += 1
         self.last_written_seq = seq_id
+        # Its status is settled, so the retransmit marker is no longer needed
+        self.retransmitted_seqs.discard(seq_id)
+        return line
 
     def _load_existing_log(self) -> None:
+        self.expected_sequence = 0
+        self.last_written_seq = -1
         try:
-            content = self.log_file.read_text(encoding="utf-8").strip()
+            with open(self.log_file, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
         except FileNotFoundError:
-            content = ""
-
-        if not content:
-            self.expected_sequence = 0
-            self.last_written_seq = -1
             return
 
+        # Walk the mapped file line by line, slicing out only the sequence field
         last_seq_id = -1
-        for log_infos in content.splitlines():
-            info = log_infos.split(",", 3)
-            if len(info) != 4:
-                continue
-            try:
-                seq_id = int(info[0])
-            except ValueError:
-                continue
-            self.seen_sequences.add(seq_id)
-            last_seq_id = seq_id
-
+        with mm:
+            size = len(mm)
+            start = 0
+            while start < size:
+                end = mm.find(b"\n", start)
+                if end == -1:
+                    end = size
+                line_start, start = start, end + 1
+
+                # A record needs all four comma-separated fields
+                comma = mm.find(b",", line_start, end)
+                if comma == -1:
+                    continue
+                second = mm.find(b",", comma + 1, end)
+                if second == -1 or mm.find(b",", second + 1, end) == -1:
+                    continue
+                try:
+                    seq_id = int(mm[line_start:comma])
+                except ValueError:
+                    continue
+                self.seen_sequences.add(seq_id)
+                last_seq_id = seq_id
+
+        self._prune_seen()
         self.last_written_seq = last_seq_id
         self.expected_sequence = last_seq_id + 1